@@ -1,24 +1,62 @@
 import os
+import re
 import sys
+import shutil
+import resource
+import html
 import json
+import time
+import signal
 import asyncio
 import logging
+import concurrent.futures
 import aiofiles
+import aiofiles.os as aos
 import aiohttp
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional, Union
+from typing import Dict, List, Set, Tuple, Optional, Union
 
-from pyrogram import Client, filters, idle
-from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, ChatMember
+from pyrogram import Client, filters
+from pyrogram.errors import FloodWait
+from pyrogram.types import (
+    Message, InlineKeyboardMarkup, InlineKeyboardButton,
+    ChatMember, ChatMemberUpdated, ChatPermissions, BotCommand
+)
 from pyrogram.enums import ChatMemberStatus, ChatType, ParseMode
 from pytgcalls import PyTgCalls
 from pytgcalls.types import Update
 from pytgcalls.types.input_stream import AudioPiped, AudioVideoPiped
 from pytgcalls.types.stream import StreamAudioEnded
 
-from youtube_search import YoutubeSearch
 import yt_dlp
 
+# Prefer orjson's C encoder for queue persistence when available; the
+# adapters below keep the stdlib fallback out of the call sites
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _json_dumps(data) -> bytes:
+    """Encode persistence payloads to bytes with orjson when present"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode()
+
+def _json_loads(raw: bytes):
+    """Decode persistence payloads, mirroring _json_dumps"""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+# Prefer uvloop's libuv-based event loop when available (POSIX only;
+# the import fails silently elsewhere and the default loop is used)
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -41,6 +79,7 @@ class Config:
     # Bot settings
     MAX_QUEUE_SIZE = 100
     MAX_DOWNLOAD_SIZE = 50  # MB
+    MAX_TEMP_BYTES = 1 << 30  # 1 GiB soft cap on cached audio in temp/
     ALLOWED_FORMATS = ["mp3", "m4a", "ogg", "wav", "flac"]
     
     # Paths
@@ -84,59 +123,106 @@ class Config:
 # DATA STRUCTURES
 # ============================================================================
 
+@dataclass(slots=True)
 class QueueItem:
-    def __init__(self, chat_id: int, title: str, url: str, duration: str, requested_by: str):
-        self.chat_id = chat_id
-        self.title = title
-        self.url = url
-        self.duration = duration
-        self.requested_by = requested_by
-        self.added_at = datetime.now()
+    chat_id: int
+    title: str
+    url: str
+    duration: str
+    requested_by: str
+    added_at: datetime = field(default_factory=datetime.now)
+
+@dataclass(slots=True)
+class ChatState:
+    """Per-chat playback state, fused so handlers do one lookup per chat"""
+    queue: List[QueueItem] = field(default_factory=list)
+    now_playing: Optional[QueueItem] = None
+    is_playing: bool = False
+    is_paused: bool = False
+    prefetched: Optional[Tuple[str, str]] = None  # (url, audio_path)
+    prefetch_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    next_event: asyncio.Event = field(default_factory=asyncio.Event)  # set on stream end
+    player_task: Optional[asyncio.Task] = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)  # guards queue mutations
 
 class MusicBot:
     def __init__(self):
-        self.queues: Dict[int, List[QueueItem]] = {}
-        self.now_playing: Dict[int, QueueItem] = {}
-        self.is_playing: Dict[int, bool] = {}
-        self.is_paused: Dict[int, bool] = {}
+        self.chats: Dict[int, ChatState] = defaultdict(ChatState)
         self.user_mutes: Dict[int, Dict[int, datetime]] = {}  # {chat_id: {user_id: unmute_time}}
-        self.banned_users: Dict[int, List[int]] = {}  # {chat_id: [user_ids]}
-        self.stats = {
-            "songs_played": 0,
-            "commands_used": 0,
-            "users_served": set(),
-            "start_time": datetime.now()
-        }
+        self.banned_users: Dict[int, Set[int]] = {}  # {chat_id: {user_ids}}
+        self.known_chats: Set[int] = set()  # every group the bot has seen
+        # Counters as plain attributes: attribute access beats dict lookups
+        # and the middleware below bumps them in one place
+        self.songs_played = 0
+        self.commands_used = 0
+        self.users_served: Set[int] = set()
+        # Monotonic start for uptime, immune to wall-clock jumps
+        self._start_monotonic = time.monotonic()
         
+        # Debounce handle for coalescing queue saves
+        self._save_pending: Optional[asyncio.Task] = None
+
+        # Running total across all queues so /stats is O(1)
+        self._total_queued = 0
+
         # Create directories
         os.makedirs("temp", exist_ok=True)
         os.makedirs("data", exist_ok=True)
-        
-        # Load saved data
-        self.load_data()
-    
-    def load_data(self):
+
+    def chat(self, chat_id: int) -> ChatState:
+        """Playback state for a chat, created on first access"""
+        return self.chats[chat_id]
+
+    async def _prefetch(self, chat_id: int):
+        """Download the next queued song in the background so the player
+        loop can start it with zero download latency"""
+        state = self.chat(chat_id)
+
+        async with state.prefetch_lock:
+            if not state.queue:
+                return
+
+            next_item = state.queue[0]
+            if state.prefetched and state.prefetched[0] == next_item.url:
+                return
+
+            audio_path = await download_audio(next_item.url, chat_id)
+            if audio_path:
+                state.prefetched = (next_item.url, audio_path)
+
+    async def load_data(self):
         """Load queues and data from file"""
         try:
             if os.path.exists(Config.QUEUE_FILE):
-                with open(Config.QUEUE_FILE, 'r') as f:
-                    data = json.load(f)
-                    # Convert back to QueueItem objects
-                    for chat_id_str, items in data.get('queues', {}).items():
-                        chat_id = int(chat_id_str)
-                        self.queues[chat_id] = [
-                            QueueItem(
-                                chat_id=item['chat_id'],
-                                title=item['title'],
-                                url=item['url'],
-                                duration=item['duration'],
-                                requested_by=item['requested_by']
-                            ) for item in items
-                        ]
+                async with aiofiles.open(Config.QUEUE_FILE, 'rb') as f:
+                    raw = await f.read()
+                data = _json_loads(raw)
+                # Convert back to QueueItem objects
+                for chat_id_str, items in data.get('queues', {}).items():
+                    chat_id = int(chat_id_str)
+                    self.chat(chat_id).queue = [
+                        QueueItem(
+                            chat_id=item['chat_id'],
+                            title=item['title'],
+                            url=item['url'],
+                            duration=item['duration'],
+                            requested_by=item['requested_by']
+                        ) for item in items
+                    ]
+                self._total_queued = sum(len(s.queue) for s in self.chats.values())
+                self.known_chats = set(data.get('known_chats', []))
         except Exception as e:
-            logger.error(f"Error loading data: {e}")
-    
-    def save_data(self):
+            logger.error(f"Error loading data: {e!r}")
+            # Move the bad file aside so the problem stays diagnosable
+            # instead of being overwritten by the next save
+            try:
+                corrupt = f"{Config.QUEUE_FILE}.corrupt.{int(time.time())}"
+                os.replace(Config.QUEUE_FILE, corrupt)
+                logger.error(f"Moved unreadable queue file to {corrupt}")
+            except OSError:
+                pass
+
+    async def save_data(self):
         """Save queues to file"""
         try:
             data = {
@@ -149,14 +235,37 @@ class MusicBot:
                             'duration': item.duration,
                             'requested_by': item.requested_by
                         } for item in items
-                    ] for chat_id, items in self.queues.items()
-                }
+                    ] for chat_id, items in (
+                        (cid, state.queue) for cid, state in self.chats.items()
+                    )
+                },
+                'known_chats': list(self.known_chats)
             }
-            with open(Config.QUEUE_FILE, 'w') as f:
-                json.dump(data, f, indent=2)
+            payload = _json_dumps(data)
+
+            # Write to a sidecar then atomically replace, so a crash
+            # mid-write can never leave a truncated queue file behind
+            tmp = Config.QUEUE_FILE + '.tmp'
+            async with aiofiles.open(tmp, 'wb') as f:
+                await f.write(payload)
+                await f.flush()
+            await aos.replace(tmp, Config.QUEUE_FILE)
         except Exception as e:
             logger.error(f"Error saving data: {e}")
 
+    def schedule_save(self):
+        """Coalesce queue saves so bursts of commands cost one disk write"""
+        if self._save_pending is None or self._save_pending.done():
+            self._save_pending = asyncio.create_task(self._debounced_save())
+
+    async def _debounced_save(self):
+        await asyncio.sleep(2)
+        # Clear the handle before writing, so a mutation that lands while
+        # save_data is on disk schedules a fresh save instead of being
+        # swallowed by a task that is already past its debounce window
+        self._save_pending = None
+        await self.save_data()
+
 # ============================================================================
 # INITIALIZE BOT
 # ============================================================================
@@ -177,17 +286,77 @@ music_bot = MusicBot()
 # HELPER FUNCTIONS
 # ============================================================================
 
-def is_admin(chat_id: int, user_id: int) -> bool:
-    """Check if user is admin in chat"""
+# Invariants computed once at import instead of per command
+PYTHON_VERSION = sys.version.split()[0]
+PLATFORM = sys.platform
+
+# Detects queries that are already YouTube URLs and captures the video id
+YT_URL_RE = re.compile(r'(?:youtube\.com/watch\?v=|youtu\.be/)([0-9A-Za-z_-]{11})')
+
+# Reply scaffolds pre-rendered as HTML at import; only the dynamic values
+# are substituted per call (HTML parsing is cheaper than Markdown)
+PLAY_STARTED_TEMPLATE = (
+    "🎶 Now playing: <b>{title}</b>\n"
+    "⏱ Duration: <code>{duration}</code>\n"
+    "👤 Requested by: {requested_by}"
+)
+QUEUED_TEMPLATE = (
+    "✅ Added to queue (#{position})\n"
+    "🎵 <b>{title}</b>\n"
+    "⏱ <code>{duration}</code>\n"
+    "👤 Requested by: {requested_by}"
+)
+NOW_PLAYING_TEMPLATE = (
+    "🎶 <b>Now Playing</b>\n"
+    "📝 <b>Title</b>: {title}\n"
+    "⏱ <b>Duration</b>: <code>{duration}</code>\n"
+    "👤 <b>Requested by</b>: {requested_by}\n"
+    "📊 <b>Queue</b>: {queue_size} songs"
+)
+PING_TEMPLATE = (
+    "🏓 Pong!\n"
+    "📡 Latency: <code>{latency}ms</code>\n"
+    "💾 RAM: <code>{ram}KB</code>"
+)
+STATS_TEMPLATE = (
+    "📊 <b>Bot Statistics</b>\n\n"
+    "• <b>Uptime</b>: {hours}h {minutes}m {seconds}s\n"
+    "• <b>Songs Played</b>: {songs_played}\n"
+    "• <b>Commands Used</b>: {commands_used}\n"
+    "• <b>Users Served</b>: {users_served}\n"
+    "• <b>Active Chats</b>: {active_chats}\n"
+    "• <b>Total in Queue</b>: {total_queued}\n\n"
+    "⚙️ <b>System Info</b>\n"
+    f"• Python: {PYTHON_VERSION}\n"
+    f"• Platform: {PLATFORM}"
+)
+
+def html_mention(user) -> str:
+    """HTML-safe inline mention for use in the HTML templates"""
+    return f'<a href="tg://user?id={user.id}">{html.escape(user.first_name or "User")}</a>'
+
+# Admin-status cache: {(chat_id, user_id): (is_admin, checked_at)}
+ADMIN_CACHE: Dict[Tuple[int, int], Tuple[bool, float]] = {}
+ADMIN_CACHE_TTL = 60  # seconds
+
+async def is_admin(chat_id: int, user_id: int) -> bool:
+    """Check if user is admin in chat (cached to avoid per-command API calls)"""
+    cached = ADMIN_CACHE.get((chat_id, user_id))
+    if cached and time.monotonic() - cached[1] < ADMIN_CACHE_TTL:
+        return cached[0]
+
     try:
-        member = bot.get_chat_member(chat_id, user_id)
-        return member.status in [
+        member = await bot.get_chat_member(chat_id, user_id)
+        result = member.status in [
             ChatMemberStatus.ADMINISTRATOR,
             ChatMemberStatus.OWNER
         ]
     except:
         return False
 
+    ADMIN_CACHE[(chat_id, user_id)] = (result, time.monotonic())
+    return result
+
 def is_owner(user_id: int) -> bool:
     """Check if user is bot owner"""
     return user_id == Config.OWNER_ID
@@ -202,47 +371,248 @@ def format_time(seconds: int) -> str:
         return f"{hours:02d}:{minutes:02d}:{secs:02d}"
     return f"{minutes:02d}:{secs:02d}"
 
+# Shared aiohttp session, created in startup() so it binds to the running loop
+HTTP_SESSION: Optional[aiohttp.ClientSession] = None
+
+# Search-result cache: same songs get requested across groups constantly
+SEARCH_CACHE: "OrderedDict[str, Tuple[float, Tuple[str, str, str]]]" = OrderedDict()
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_TTL = 24 * 3600  # seconds
+SEARCH_LOCKS: Dict[str, asyncio.Lock] = {}
+
+# Minimal ytInitialData extraction for the first search result
+VIDEO_ID_RE = re.compile(r'"videoRenderer":\{"videoId":"([0-9A-Za-z_-]{11})"')
+VIDEO_TITLE_RE = re.compile(r'"title":\{"runs":\[\{"text":"((?:[^"\\]|\\.)*)"')
+VIDEO_LENGTH_RE = re.compile(r'"lengthText":\{[^}]*?"simpleText":"([^"]+)"')
+
+def _cached_search(key: str) -> Optional[Tuple[str, str, str]]:
+    """Return a fresh cached result or None"""
+    cached = SEARCH_CACHE.get(key)
+    if cached and time.monotonic() - cached[0] < SEARCH_CACHE_TTL:
+        SEARCH_CACHE.move_to_end(key)
+        return cached[1]
+    return None
+
+def _blocking_probe(url: str) -> dict:
+    """Fetch metadata for a direct URL without downloading"""
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'noplaylist': True}) as ydl:
+        return ydl.extract_info(url, download=False)
+
 async def search_youtube(query: str) -> Tuple[str, str, str]:
     """Search YouTube for a song and return first result"""
-    try:
-        results = YoutubeSearch(query, max_results=1).to_dict()
-        if results:
-            video = results[0]
-            title = video['title']
-            url = f"https://youtube.com/watch?v={video['id']}"
-            duration = video.get('duration', '0:00')
-            return title, url, duration
-    except Exception as e:
-        logger.error(f"Search error: {e}")
+    # Direct URLs skip the search page entirely
+    url_match = YT_URL_RE.search(query)
+    if url_match:
+        video_id = url_match.group(1)
+        result = _cached_search(video_id)
+        if result:
+            return result
+
+        url = f"https://youtube.com/watch?v={video_id}"
+        try:
+            loop = asyncio.get_running_loop()
+            info = await loop.run_in_executor(DOWNLOAD_POOL, _blocking_probe, url)
+            result = (
+                info.get('title', 'Unknown'),
+                url,
+                format_time(int(info.get('duration') or 0))
+            )
+            SEARCH_CACHE[video_id] = (time.monotonic(), result)
+            return result
+        except Exception as e:
+            logger.error(f"Metadata error: {e}")
+            return None, None, None
+
+    key = query.strip().lower()
+
+    result = _cached_search(key)
+    if result:
+        return result
+
+    # Per-key lock so concurrent identical searches hit YouTube once
+    lock = SEARCH_LOCKS.setdefault(key, asyncio.Lock())
+    async with lock:
+        result = _cached_search(key)
+        if result:
+            return result
+
+        try:
+            async with HTTP_SESSION.get(
+                "https://www.youtube.com/results",
+                params={"search_query": query},
+                timeout=aiohttp.ClientTimeout(total=5)
+            ) as resp:
+                page = await resp.text()
+
+            id_match = VIDEO_ID_RE.search(page)
+            if id_match:
+                title_match = VIDEO_TITLE_RE.search(page, id_match.end())
+                length_match = VIDEO_LENGTH_RE.search(page, id_match.end())
+
+                title = json.loads(f'"{title_match.group(1)}"') if title_match else "Unknown"
+                url = f"https://youtube.com/watch?v={id_match.group(1)}"
+                duration = length_match.group(1) if length_match else "0:00"
+
+                result = (title, url, duration)
+                SEARCH_CACHE[key] = (time.monotonic(), result)
+                while len(SEARCH_CACHE) > SEARCH_CACHE_SIZE:
+                    SEARCH_CACHE.popitem(last=False)
+                return result
+        except Exception as e:
+            logger.error(f"Search error: {e}")
+        finally:
+            SEARCH_LOCKS.pop(key, None)
     return None, None, None
 
+# Bounded pool so yt-dlp downloads never run on the event loop thread
+DOWNLOAD_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+def _blocking_download(url: str) -> Optional[str]:
+    """Synchronous yt-dlp download, meant to run in DOWNLOAD_POOL"""
+    ydl_opts = {
+        'format': 'bestaudio[ext=m4a]/bestaudio',
+        'outtmpl': f'temp/%(id)s.%(ext)s',
+        'quiet': True,
+        'no_warnings': True,
+        'extractaudio': True,
+        'audioformat': 'mp3',
+        'noplaylist': True,
+        'max_filesize': Config.MAX_DOWNLOAD_SIZE * 1024 * 1024,
+    }
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=True)
+        filename = ydl.prepare_filename(info)
+
+        # Change extension to .mp3 if needed
+        if not filename.endswith('.mp3'):
+            new_filename = os.path.splitext(filename)[0] + '.mp3'
+            os.rename(filename, new_filename)
+            return new_filename
+        return filename
+
+# Coalesces concurrent downloads of the same video and keeps finished
+# files in a byte-capped on-disk LRU so repeat requests skip yt-dlp entirely
+INFLIGHT: Dict[str, asyncio.Future] = {}
+DISK_CACHE: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()  # {video_id: (path, bytes)}
+_disk_cache_bytes = 0
+
+def _seed_disk_cache():
+    """Rebuild DISK_CACHE from files a crash left in temp/, meant to run
+    in a worker thread before handlers start.
+
+    Incomplete downloads are junk and removed; finished .mp3 files count
+    against the disk cap with the oldest evicted first, and survivors are
+    seeded oldest-to-newest so LRU order matches their mtimes. scandir
+    DirEntry objects carry the stat result, so each file is stat'ed once;
+    deletes go through a held directory fd so the kernel skips the full
+    path walk per unlink"""
+    global _disk_cache_bytes
+
+    try:
+        dir_fd = os.open("temp", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        files = []
+        _unlink = os.unlink  # avoid the attribute lookup per deletion
+        with os.scandir(dir_fd) as it:
+            for entry in it:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if not entry.name.endswith('.mp3'):
+                    try:
+                        _unlink(entry.name, dir_fd=dir_fd)
+                    except OSError:
+                        pass
+                    continue
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, entry.name))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, name in files:
+            if total <= Config.MAX_TEMP_BYTES:
+                break
+            total -= size
+            evicted += 1
+            try:
+                _unlink(name, dir_fd=dir_fd)
+            except OSError:
+                pass
+        for _, size, name in files[evicted:]:
+            video_id = os.path.splitext(name)[0]
+            DISK_CACHE[video_id] = (os.path.join("temp", name), size)
+            _disk_cache_bytes += size
+        if DISK_CACHE:
+            logger.info(f"Seeded {len(DISK_CACHE)} cached downloads from temp/")
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
 async def download_audio(url: str, chat_id: int) -> Optional[str]:
-    """Download audio from YouTube"""
+    """Download audio from YouTube without blocking the event loop.
+
+    Concurrent requests for the same video await a single download, and
+    the resulting file is reused from DISK_CACHE on later requests."""
+    global _disk_cache_bytes
+
+    id_match = YT_URL_RE.search(url)
+    video_id = id_match.group(1) if id_match else url
+
+    cached = DISK_CACHE.get(video_id)
+    if cached:
+        if os.path.exists(cached[0]):
+            DISK_CACHE.move_to_end(video_id)
+            return cached[0]
+        DISK_CACHE.pop(video_id, None)
+        _disk_cache_bytes -= cached[1]
+
+    inflight = INFLIGHT.get(video_id)
+    if inflight is not None:
+        return await inflight
+
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    INFLIGHT[video_id] = fut
+
+    path = None
     try:
-        ydl_opts = {
-            'format': 'bestaudio[ext=m4a]/bestaudio',
-            'outtmpl': f'temp/%(id)s.%(ext)s',
-            'quiet': True,
-            'no_warnings': True,
-            'extractaudio': True,
-            'audioformat': 'mp3',
-            'noplaylist': True,
-            'max_filesize': Config.MAX_DOWNLOAD_SIZE * 1024 * 1024,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            filename = ydl.prepare_filename(info)
-            
-            # Change extension to .mp3 if needed
-            if not filename.endswith('.mp3'):
-                new_filename = os.path.splitext(filename)[0] + '.mp3'
-                os.rename(filename, new_filename)
-                return new_filename
-            return filename
+        path = await loop.run_in_executor(DOWNLOAD_POOL, _blocking_download, url)
     except Exception as e:
         logger.error(f"Download error: {e}")
-        return None
+    finally:
+        # Resolve unconditionally: if this task is cancelled mid-download
+        # (/stop and /end cancel the player task), other chats awaiting
+        # the shared future must not hang forever
+        INFLIGHT.pop(video_id, None)
+        if not fut.done():
+            fut.set_result(path)
+
+    if path:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        DISK_CACHE[video_id] = (path, size)
+        _disk_cache_bytes += size
+        while _disk_cache_bytes > Config.MAX_TEMP_BYTES and len(DISK_CACHE) > 1:
+            _, (old_path, old_size) = DISK_CACHE.popitem(last=False)
+            _disk_cache_bytes -= old_size
+            CLEANUP_QUEUE.put_nowait(old_path)
+    return path
+
+# Evicted files are deleted in batches by a single background task
+CLEANUP_QUEUE: "asyncio.Queue[str]" = asyncio.Queue()
+
+async def _cleaner():
+    """Drain queued file deletions in batches without blocking the loop"""
+    while True:
+        paths = [await CLEANUP_QUEUE.get()]
+        while not CLEANUP_QUEUE.empty() and len(paths) < 32:
+            paths.append(CLEANUP_QUEUE.get_nowait())
+        await asyncio.gather(*(aos.remove(p) for p in paths), return_exceptions=True)
 
 async def send_status_message(chat_id: int, text: str):
     """Send status message with formatting"""
@@ -261,9 +631,6 @@ async def send_status_message(chat_id: int, text: str):
 @bot.on_message(filters.command("start"))
 async def start_command(client: Client, message: Message):
     """Start command handler"""
-    music_bot.stats["commands_used"] += 1
-    music_bot.stats["users_served"].add(message.from_user.id)
-    
     keyboard = InlineKeyboardMarkup([
         [InlineKeyboardButton("📚 Commands", callback_data="help"),
          InlineKeyboardButton("🎵 Play Music", callback_data="play_help")],
@@ -282,24 +649,21 @@ async def start_command(client: Client, message: Message):
 @bot.on_message(filters.command("help"))
 async def help_command(client: Client, message: Message):
     """Help command handler"""
-    music_bot.stats["commands_used"] += 1
     await message.reply_text(Config.HELP_TEXT)
 
 @bot.on_message(filters.command("play"))
 async def play_command(client: Client, message: Message):
     """Play music command"""
-    music_bot.stats["commands_used"] += 1
-    
     # Check if in group
     if message.chat.type not in [ChatType.GROUP, ChatType.SUPERGROUP]:
-        await message.reply_text("❌ This command can only be used in groups!")
+        await message.reply_text("❌ This command can only be used in groups!", parse_mode=ParseMode.DISABLED)
         return
     
     # Check if user is in voice chat
     try:
         member = await client.get_chat_member(message.chat.id, message.from_user.id)
         if not member.joined_date:
-            await message.reply_text("❌ You must be in the voice chat to play music!")
+            await message.reply_text("❌ You must be in the voice chat to play music!", parse_mode=ParseMode.DISABLED)
             return
     except:
         pass
@@ -313,232 +677,289 @@ async def play_command(client: Client, message: Message):
     chat_id = message.chat.id
     
     # Send searching message
-    status_msg = await message.reply_text("🔍 Searching...")
+    status_msg = await message.reply_text("🔍 Searching...", parse_mode=ParseMode.DISABLED)
     
     # Search YouTube
     title, url, duration = await search_youtube(query)
     if not title:
-        await status_msg.edit_text("❌ No results found!")
+        await status_msg.edit_text("❌ No results found!", parse_mode=ParseMode.DISABLED)
         return
     
-    # Add to queue
-    if chat_id not in music_bot.queues:
-        music_bot.queues[chat_id] = []
-    
-    if len(music_bot.queues[chat_id]) >= Config.MAX_QUEUE_SIZE:
-        await status_msg.edit_text("❌ Queue is full! Maximum size reached.")
-        return
-    
-    queue_item = QueueItem(
-        chat_id=chat_id,
-        title=title,
-        url=url,
-        duration=duration,
-        requested_by=message.from_user.mention
-    )
-    music_bot.queues[chat_id].append(queue_item)
-    
-    # Save queue
-    music_bot.save_data()
-    
-    # If nothing is playing, start playing
-    if not music_bot.is_playing.get(chat_id) or not music_bot.is_paused.get(chat_id):
-        await play_next(chat_id)
-        await status_msg.edit_text(f"🎶 Now playing: **{title}**\n"
-                                  f"⏱ Duration: `{duration}`\n"
-                                  f"👤 Requested by: {message.from_user.mention}")
+    # Add to queue under the chat lock so concurrent /play commands
+    # can't overshoot the cap or double-start the player
+    state = music_bot.chat(chat_id)
+
+    async with state.lock:
+        if len(state.queue) >= Config.MAX_QUEUE_SIZE:
+            await status_msg.edit_text("❌ Queue is full! Maximum size reached.", parse_mode=ParseMode.DISABLED)
+            return
+
+        queue_item = QueueItem(
+            chat_id=chat_id,
+            title=title,
+            url=url,
+            duration=duration,
+            requested_by=html_mention(message.from_user)
+        )
+        state.queue.append(queue_item)
+        music_bot._total_queued += 1
+        position = len(state.queue)
+
+        # Save queue
+        music_bot.schedule_save()
+
+        # If no player loop is running for this chat, start one
+        task = state.player_task
+        started = task is None or task.done()
+        if started:
+            start_player(chat_id)
+
+    if started:
+        await status_msg.edit_text(
+            PLAY_STARTED_TEMPLATE.format(
+                title=html.escape(title),
+                duration=duration,
+                requested_by=queue_item.requested_by
+            ),
+            parse_mode=ParseMode.HTML
+        )
     else:
-        position = len(music_bot.queues[chat_id])
-        await status_msg.edit_text(f"✅ Added to queue (#{position})\n"
-                                  f"🎵 **{title}**\n"
-                                  f"⏱ `{duration}`\n"
-                                  f"👤 Requested by: {message.from_user.mention}")
+        await status_msg.edit_text(
+            QUEUED_TEMPLATE.format(
+                position=position,
+                title=html.escape(title),
+                duration=duration,
+                requested_by=queue_item.requested_by
+            ),
+            parse_mode=ParseMode.HTML
+        )
 
 @bot.on_message(filters.command("pause"))
 async def pause_command(client: Client, message: Message):
     """Pause music command"""
-    music_bot.stats["commands_used"] += 1
     chat_id = message.chat.id
     
-    if not music_bot.is_playing.get(chat_id) or music_bot.is_paused.get(chat_id):
-        await message.reply_text("❌ No music is playing or already paused!")
+    state = music_bot.chat(chat_id)
+    if not state.is_playing or state.is_paused:
+        await message.reply_text("❌ No music is playing or already paused!", parse_mode=ParseMode.DISABLED)
         return
-    
+
     try:
         await calls.pause_stream(chat_id)
-        music_bot.is_paused[chat_id] = True
-        await message.reply_text("⏸ Music paused!")
+        state.is_paused = True
+        await message.reply_text("⏸ Music paused!", parse_mode=ParseMode.DISABLED)
     except Exception as e:
-        await message.reply_text("❌ Failed to pause music!")
+        await message.reply_text("❌ Failed to pause music!", parse_mode=ParseMode.DISABLED)
 
 @bot.on_message(filters.command("resume"))
 async def resume_command(client: Client, message: Message):
     """Resume music command"""
-    music_bot.stats["commands_used"] += 1
     chat_id = message.chat.id
     
-    if not music_bot.is_paused.get(chat_id):
-        await message.reply_text("❌ Music is not paused!")
+    state = music_bot.chat(chat_id)
+    if not state.is_paused:
+        await message.reply_text("❌ Music is not paused!", parse_mode=ParseMode.DISABLED)
         return
-    
+
     try:
         await calls.resume_stream(chat_id)
-        music_bot.is_paused[chat_id] = False
-        await message.reply_text("▶️ Music resumed!")
+        state.is_paused = False
+        await message.reply_text("▶️ Music resumed!", parse_mode=ParseMode.DISABLED)
     except Exception as e:
-        await message.reply_text("❌ Failed to resume music!")
+        await message.reply_text("❌ Failed to resume music!", parse_mode=ParseMode.DISABLED)
 
 @bot.on_message(filters.command("skip"))
 async def skip_command(client: Client, message: Message):
     """Skip music command"""
-    music_bot.stats["commands_used"] += 1
     chat_id = message.chat.id
     
-    if not music_bot.is_playing.get(chat_id):
-        await message.reply_text("❌ No music is playing!")
+    state = music_bot.chat(chat_id)
+    if not state.is_playing:
+        await message.reply_text("❌ No music is playing!", parse_mode=ParseMode.DISABLED)
         return
-    
+
     # Check if user is admin or requester
-    current_song = music_bot.now_playing.get(chat_id)
-    if current_song and current_song.requested_by != message.from_user.mention:
-        if not is_admin(chat_id, message.from_user.id):
-            await message.reply_text("❌ You can only skip songs you requested!")
+    current_song = state.now_playing
+    if current_song and current_song.requested_by != html_mention(message.from_user):
+        if not await is_admin(chat_id, message.from_user.id):
+            await message.reply_text("❌ You can only skip songs you requested!", parse_mode=ParseMode.DISABLED)
             return
-    
-    await message.reply_text("⏭ Skipping current song...")
-    await play_next(chat_id)
+
+    await message.reply_text("⏭ Skipping current song...", parse_mode=ParseMode.DISABLED)
+    state.next_event.set()
 
 @bot.on_message(filters.command("stop"))
 async def stop_command(client: Client, message: Message):
     """Stop music command"""
-    music_bot.stats["commands_used"] += 1
     chat_id = message.chat.id
     
-    if not music_bot.is_playing.get(chat_id):
-        await message.reply_text("❌ No music is playing!")
+    state = music_bot.chat(chat_id)
+    if not state.is_playing:
+        await message.reply_text("❌ No music is playing!", parse_mode=ParseMode.DISABLED)
         return
-    
+
     try:
+        if state.player_task:
+            state.player_task.cancel()
+            state.player_task = None
         await calls.leave_group_call(chat_id)
-        music_bot.is_playing[chat_id] = False
-        music_bot.is_paused[chat_id] = False
-        await message.reply_text("⏹ Music stopped!")
+        state.is_playing = False
+        state.is_paused = False
+        await message.reply_text("⏹ Music stopped!", parse_mode=ParseMode.DISABLED)
     except Exception as e:
-        await message.reply_text("❌ Failed to stop music!")
+        await message.reply_text("❌ Failed to stop music!", parse_mode=ParseMode.DISABLED)
 
 @bot.on_message(filters.command("end"))
 async def end_command(client: Client, message: Message):
     """End playback command"""
-    music_bot.stats["commands_used"] += 1
     chat_id = message.chat.id
     
-    if chat_id in music_bot.queues:
-        music_bot.queues[chat_id].clear()
-    
-    if chat_id in music_bot.now_playing:
-        del music_bot.now_playing[chat_id]
-    
-    music_bot.is_playing[chat_id] = False
-    music_bot.is_paused[chat_id] = False
+    state = music_bot.chat(chat_id)
+    async with state.lock:
+        if state.player_task:
+            state.player_task.cancel()
+            state.player_task = None
+
+        music_bot._total_queued -= len(state.queue)
+        state.queue.clear()
+        state.now_playing = None
+        state.is_playing = False
+        state.is_paused = False
     
     try:
         await calls.leave_group_call(chat_id)
     except:
         pass
     
-    music_bot.save_data()
-    await message.reply_text("🎵 Playback ended and queue cleared!")
+    music_bot.schedule_save()
+    await message.reply_text("🎵 Playback ended and queue cleared!", parse_mode=ParseMode.DISABLED)
 
 @bot.on_message(filters.command("clear"))
 async def clear_command(client: Client, message: Message):
     """Clear queue command"""
-    music_bot.stats["commands_used"] += 1
     chat_id = message.chat.id
     
-    if chat_id not in music_bot.queues or not music_bot.queues[chat_id]:
-        await message.reply_text("❌ Queue is already empty!")
-        return
-    
-    queue_count = len(music_bot.queues[chat_id])
-    music_bot.queues[chat_id].clear()
-    music_bot.save_data()
+    state = music_bot.chat(chat_id)
+    async with state.lock:
+        if not state.queue:
+            await message.reply_text("❌ Queue is already empty!", parse_mode=ParseMode.DISABLED)
+            return
+
+        queue_count = len(state.queue)
+        music_bot._total_queued -= queue_count
+        state.queue.clear()
+    music_bot.schedule_save()
     
-    await message.reply_text(f"🧹 Cleared {queue_count} songs from queue!")
+    await message.reply_text(f"🧹 Cleared {queue_count} songs from queue!", parse_mode=ParseMode.DISABLED)
 
 # 🛠 UTILITY COMMANDS
 
 @bot.on_message(filters.command("ping"))
 async def ping_command(client: Client, message: Message):
     """Ping command to check latency"""
-    music_bot.stats["commands_used"] += 1
-    start = datetime.now()
-    msg = await message.reply_text("🏓 Pong!")
-    end = datetime.now()
-    latency = (end - start).microseconds / 1000
-    
-    await msg.edit_text(f"🏓 Pong!\n📡 Latency: `{latency}ms`\n"
-                       f"💾 RAM: `{sys.getsizeof(music_bot) // 1024}KB`")
+    start = time.perf_counter()
+    msg = await message.reply_text("🏓 Pong!", parse_mode=ParseMode.DISABLED)
+    latency = round((time.perf_counter() - start) * 1000, 1)
+
+    # ru_maxrss is the process peak RSS in KB on Linux
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    await msg.edit_text(
+        PING_TEMPLATE.format(latency=latency, ram=rss_kb),
+        parse_mode=ParseMode.HTML
+    )
 
 @bot.on_message(filters.command("reboot"))
 async def reboot_command(client: Client, message: Message):
     """Reboot bot command (Owner only)"""
     if not is_owner(message.from_user.id):
-        await message.reply_text("❌ This command is for bot owner only!")
+        await message.reply_text("❌ This command is for bot owner only!", parse_mode=ParseMode.DISABLED)
         return
     
-    music_bot.stats["commands_used"] += 1
-    await message.reply_text("🔄 Rebooting bot...")
+    await message.reply_text("🔄 Rebooting bot...", parse_mode=ParseMode.DISABLED)
     os.execv(sys.executable, [sys.executable] + sys.argv)
 
 @bot.on_message(filters.command("broadcast"))
 async def broadcast_command(client: Client, message: Message):
     """Broadcast message to all groups (Owner only)"""
     if not is_owner(message.from_user.id):
-        await message.reply_text("❌ This command is for bot owner only!")
+        await message.reply_text("❌ This command is for bot owner only!", parse_mode=ParseMode.DISABLED)
         return
     
     if len(message.command) < 2:
-        await message.reply_text("❌ Please provide a message to broadcast!")
+        await message.reply_text("❌ Please provide a message to broadcast!", parse_mode=ParseMode.DISABLED)
         return
     
-    music_bot.stats["commands_used"] += 1
-    broadcast_text = " ".join(message.command[1:])
-    
-    await message.reply_text("📢 Starting broadcast...")
-    
-    # Get all chats where bot is member
-    success = 0
-    failed = 0
-    
-    async for dialog in client.get_dialogs():
-        if dialog.chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]:
+    broadcast_text = f"📢 **Broadcast Message**\n\n" + " ".join(message.command[1:])
+
+    status_msg = await message.reply_text("📢 Starting broadcast...", parse_mode=ParseMode.DISABLED)
+
+    # Groups are tracked incrementally as messages arrive; only crawl the
+    # dialog list once to seed the cache after a fresh start
+    if not music_bot.known_chats:
+        async for dialog in client.get_dialogs():
+            if dialog.chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]:
+                music_bot.known_chats.add(dialog.chat.id)
+        music_bot.schedule_save()
+
+    chat_ids = list(music_bot.known_chats)
+
+    sem = asyncio.Semaphore(20)
+    done = 0
+
+    async def _send_one(target_id: int) -> bool:
+        nonlocal done
+        async with sem:
             try:
-                await client.send_message(
-                    dialog.chat.id,
-                    f"📢 **Broadcast Message**\n\n{broadcast_text}"
-                )
-                success += 1
-                await asyncio.sleep(0.5)  # Prevent flooding
+                await client.send_message(target_id, broadcast_text)
+                return True
+            except FloodWait as e:
+                await asyncio.sleep(e.value)
+                try:
+                    await client.send_message(target_id, broadcast_text)
+                    return True
+                except:
+                    return False
             except:
-                failed += 1
-    
-    await message.reply_text(f"✅ Broadcast completed!\n"
-                           f"✅ Success: {success}\n"
-                           f"❌ Failed: {failed}")
+                return False
+            finally:
+                done += 1
+                if done % 50 == 0:
+                    try:
+                        await status_msg.edit_text(f"📢 Broadcasting... {done}/{len(chat_ids)}", parse_mode=ParseMode.DISABLED)
+                    except:
+                        pass
+
+    results = await asyncio.gather(*(_send_one(c) for c in chat_ids))
+    success = sum(results)
+
+    await status_msg.edit_text(f"✅ Broadcast completed!\n"
+                             f"✅ Success: {success}\n"
+                             f"❌ Failed: {len(results) - success}")
+
+@bot.on_message(group=-2)
+async def stats_middleware(client: Client, message: Message):
+    """Count command usage and users served once, for every handler"""
+    if message.text and message.text.startswith("/"):
+        music_bot.commands_used += 1
+        if message.from_user:
+            music_bot.users_served.add(message.from_user.id)
+
+@bot.on_message(filters.group, group=-1)
+async def track_chats(client: Client, message: Message):
+    """Record every group the bot sees so broadcasts skip the dialog scan"""
+    music_bot.known_chats.add(message.chat.id)
 
 # 🛡 ADMIN/MODERATION COMMANDS
 
 @bot.on_message(filters.command("mute"))
 async def mute_command(client: Client, message: Message):
     """Mute a user in chat"""
-    music_bot.stats["commands_used"] += 1
-    
-    if not is_admin(message.chat.id, message.from_user.id):
-        await message.reply_text("❌ You need to be admin to use this command!")
+    if not await is_admin(message.chat.id, message.from_user.id):
+        await message.reply_text("❌ You need to be admin to use this command!", parse_mode=ParseMode.DISABLED)
         return
     
     if not message.reply_to_message:
-        await message.reply_text("❌ Please reply to a user's message to mute them!")
+        await message.reply_text("❌ Please reply to a user's message to mute them!", parse_mode=ParseMode.DISABLED)
         return
     
     target_user = message.reply_to_message.from_user
@@ -552,19 +973,17 @@ async def mute_command(client: Client, message: Message):
         )
         await message.reply_text(f"🔇 User {target_user.mention} has been muted!")
     except Exception as e:
-        await message.reply_text("❌ Failed to mute user!")
+        await message.reply_text("❌ Failed to mute user!", parse_mode=ParseMode.DISABLED)
 
 @bot.on_message(filters.command("unmute"))
 async def unmute_command(client: Client, message: Message):
     """Unmute a user in chat"""
-    music_bot.stats["commands_used"] += 1
-    
-    if not is_admin(message.chat.id, message.from_user.id):
-        await message.reply_text("❌ You need to be admin to use this command!")
+    if not await is_admin(message.chat.id, message.from_user.id):
+        await message.reply_text("❌ You need to be admin to use this command!", parse_mode=ParseMode.DISABLED)
         return
     
     if not message.reply_to_message:
-        await message.reply_text("❌ Please reply to a user's message to unmute them!")
+        await message.reply_text("❌ Please reply to a user's message to unmute them!", parse_mode=ParseMode.DISABLED)
         return
     
     target_user = message.reply_to_message.from_user
@@ -583,19 +1002,17 @@ async def unmute_command(client: Client, message: Message):
         )
         await message.reply_text(f"🔊 User {target_user.mention} has been unmuted!")
     except Exception as e:
-        await message.reply_text("❌ Failed to unmute user!")
+        await message.reply_text("❌ Failed to unmute user!", parse_mode=ParseMode.DISABLED)
 
 @bot.on_message(filters.command("ban"))
 async def ban_command(client: Client, message: Message):
     """Ban a user from chat"""
-    music_bot.stats["commands_used"] += 1
-    
-    if not is_admin(message.chat.id, message.from_user.id):
-        await message.reply_text("❌ You need to be admin to use this command!")
+    if not await is_admin(message.chat.id, message.from_user.id):
+        await message.reply_text("❌ You need to be admin to use this command!", parse_mode=ParseMode.DISABLED)
         return
     
     if not message.reply_to_message:
-        await message.reply_text("❌ Please reply to a user's message to ban them!")
+        await message.reply_text("❌ Please reply to a user's message to ban them!", parse_mode=ParseMode.DISABLED)
         return
     
     target_user = message.reply_to_message.from_user
@@ -605,25 +1022,21 @@ async def ban_command(client: Client, message: Message):
         await client.ban_chat_member(chat_id, target_user.id)
         
         # Add to banned list
-        if chat_id not in music_bot.banned_users:
-            music_bot.banned_users[chat_id] = []
-        music_bot.banned_users[chat_id].append(target_user.id)
+        music_bot.banned_users.setdefault(chat_id, set()).add(target_user.id)
         
         await message.reply_text(f"🚫 User {target_user.mention} has been banned!")
     except Exception as e:
-        await message.reply_text("❌ Failed to ban user!")
+        await message.reply_text("❌ Failed to ban user!", parse_mode=ParseMode.DISABLED)
 
 @bot.on_message(filters.command("unban"))
 async def unban_command(client: Client, message: Message):
     """Unban a user from chat"""
-    music_bot.stats["commands_used"] += 1
-    
-    if not is_admin(message.chat.id, message.from_user.id):
-        await message.reply_text("❌ You need to be admin to use this command!")
+    if not await is_admin(message.chat.id, message.from_user.id):
+        await message.reply_text("❌ You need to be admin to use this command!", parse_mode=ParseMode.DISABLED)
         return
     
     if not message.reply_to_message:
-        await message.reply_text("❌ Please reply to a user's message to unban them!")
+        await message.reply_text("❌ Please reply to a user's message to unban them!", parse_mode=ParseMode.DISABLED)
         return
     
     target_user = message.reply_to_message.from_user
@@ -633,25 +1046,21 @@ async def unban_command(client: Client, message: Message):
         await client.unban_chat_member(chat_id, target_user.id)
         
         # Remove from banned list
-        if chat_id in music_bot.banned_users:
-            if target_user.id in music_bot.banned_users[chat_id]:
-                music_bot.banned_users[chat_id].remove(target_user.id)
+        music_bot.banned_users.get(chat_id, set()).discard(target_user.id)
         
         await message.reply_text(f"✅ User {target_user.mention} has been unbanned!")
     except Exception as e:
-        await message.reply_text("❌ Failed to unban user!")
+        await message.reply_text("❌ Failed to unban user!", parse_mode=ParseMode.DISABLED)
 
 @bot.on_message(filters.command("kick"))
 async def kick_command(client: Client, message: Message):
     """Kick a user from chat"""
-    music_bot.stats["commands_used"] += 1
-    
-    if not is_admin(message.chat.id, message.from_user.id):
-        await message.reply_text("❌ You need to be admin to use this command!")
+    if not await is_admin(message.chat.id, message.from_user.id):
+        await message.reply_text("❌ You need to be admin to use this command!", parse_mode=ParseMode.DISABLED)
         return
     
     if not message.reply_to_message:
-        await message.reply_text("❌ Please reply to a user's message to kick them!")
+        await message.reply_text("❌ Please reply to a user's message to kick them!", parse_mode=ParseMode.DISABLED)
         return
     
     target_user = message.reply_to_message.from_user
@@ -664,125 +1073,148 @@ async def kick_command(client: Client, message: Message):
         
         await message.reply_text(f"👢 User {target_user.mention} has been kicked!")
     except Exception as e:
-        await message.reply_text("❌ Failed to kick user!")
+        await message.reply_text("❌ Failed to kick user!", parse_mode=ParseMode.DISABLED)
 
 @bot.on_message(filters.command("stats"))
 async def stats_command(client: Client, message: Message):
     """Show bot statistics"""
-    music_bot.stats["commands_used"] += 1
-    
-    uptime = datetime.now() - music_bot.stats["start_time"]
-    hours, remainder = divmod(int(uptime.total_seconds()), 3600)
+    uptime = time.monotonic() - music_bot._start_monotonic
+    hours, remainder = divmod(int(uptime), 3600)
     minutes, seconds = divmod(remainder, 60)
     
-    stats_text = (
-        "📊 **Bot Statistics**\n\n"
-        f"• **Uptime**: {hours}h {minutes}m {seconds}s\n"
-        f"• **Songs Played**: {music_bot.stats['songs_played']}\n"
-        f"• **Commands Used**: {music_bot.stats['commands_used']}\n"
-        f"• **Users Served**: {len(music_bot.stats['users_served'])}\n"
-        f"• **Active Chats**: {len(music_bot.queues)}\n"
-        f"• **Total in Queue**: {sum(len(q) for q in music_bot.queues.values())}\n\n"
-        "⚙️ **System Info**\n"
-        f"• Python: {sys.version.split()[0]}\n"
-        f"• Platform: {sys.platform}"
+    stats_text = STATS_TEMPLATE.format(
+        hours=hours,
+        minutes=minutes,
+        seconds=seconds,
+        songs_played=music_bot.songs_played,
+        commands_used=music_bot.commands_used,
+        users_served=len(music_bot.users_served),
+        active_chats=len(music_bot.chats),
+        total_queued=music_bot._total_queued
     )
-    
-    await message.reply_text(stats_text)
+
+    await message.reply_text(stats_text, parse_mode=ParseMode.HTML)
 
 # ============================================================================
 # MUSIC PLAYBACK FUNCTIONS
 # ============================================================================
 
-async def play_next(chat_id: int):
-    """Play next song in queue"""
-    if chat_id not in music_bot.queues or not music_bot.queues[chat_id]:
-        music_bot.is_playing[chat_id] = False
-        return
-    
-    # Get next song
-    queue_item = music_bot.queues[chat_id].pop(0)
-    music_bot.now_playing[chat_id] = queue_item
-    music_bot.is_playing[chat_id] = True
-    music_bot.is_paused[chat_id] = False
-    
-    # Save queue
-    music_bot.save_data()
-    
-    # Download audio
-    status_msg = await bot.send_message(chat_id, f"⬇️ Downloading: **{queue_item.title}**...")
-    audio_path = await download_audio(queue_item.url, chat_id)
-    
-    if not audio_path:
-        await status_msg.edit_text(f"❌ Failed to download: {queue_item.title}")
-        await play_next(chat_id)
-        return
-    
+def _parse_duration(duration: str) -> int:
+    """Parse mm:ss or hh:mm:ss into seconds, defaulting to 3 minutes"""
     try:
-        # Join voice chat if not already joined
-        try:
-            await calls.join_group_call(
-                chat_id,
-                AudioPiped(audio_path)
-            )
-        except:
-            # If already joined, change stream
-            await calls.change_stream(
-                chat_id,
-                AudioPiped(audio_path)
-            )
-        
-        music_bot.stats["songs_played"] += 1
-        
-        # Update status message
-        await status_msg.edit_text(
-            f"🎶 **Now Playing**\n"
-            f"📝 **Title**: {queue_item.title}\n"
-            f"⏱ **Duration**: `{queue_item.duration}`\n"
-            f"👤 **Requested by**: {queue_item.requested_by}\n"
-            f"📊 **Queue**: {len(music_bot.queues.get(chat_id, []))} songs"
-        )
-        
-        # Wait for song to finish
-        # In production, you'd listen for StreamAudioEnded event
-        # For simplicity, we'll estimate duration
-        try:
-            # Parse duration (mm:ss or hh:mm:ss)
-            duration_parts = queue_item.duration.split(':')
-            if len(duration_parts) == 3:
-                hours, minutes, seconds = map(int, duration_parts)
-                total_seconds = hours * 3600 + minutes * 60 + seconds
-            elif len(duration_parts) == 2:
-                minutes, seconds = map(int, duration_parts)
-                total_seconds = minutes * 60 + seconds
+        parts = [int(p) for p in duration.split(':')]
+    except (ValueError, AttributeError):
+        return 180
+
+    if len(parts) == 3:
+        return parts[0] * 3600 + parts[1] * 60 + parts[2]
+    if len(parts) == 2:
+        return parts[0] * 60 + parts[1]
+    return 180
+
+def start_player(chat_id: int):
+    """Start the per-chat player loop if it isn't already running"""
+    state = music_bot.chat(chat_id)
+    if state.player_task is None or state.player_task.done():
+        state.player_task = asyncio.create_task(_player_loop(chat_id))
+
+async def _player_loop(chat_id: int):
+    """Long-lived playback loop for one chat, driven by stream-end events"""
+    state = music_bot.chat(chat_id)
+    event = state.next_event
+
+    try:
+        while True:
+            async with state.lock:
+                if not state.queue:
+                    break
+                queue_item = state.queue.pop(0)
+                music_bot._total_queued -= 1
+                state.now_playing = queue_item
+                state.is_playing = True
+                state.is_paused = False
+
+            # Save queue
+            music_bot.schedule_save()
+
+            # Use the prefetched file if it matches, otherwise download now
+            prefetched = state.prefetched
+            state.prefetched = None
+            if prefetched and prefetched[0] == queue_item.url:
+                audio_path = prefetched[1]
+                status_msg = await bot.send_message(
+                    chat_id,
+                    f"🎵 Loading: <b>{html.escape(queue_item.title)}</b>...",
+                    parse_mode=ParseMode.HTML
+                )
             else:
-                total_seconds = 180  # Default 3 minutes
-            
-            await asyncio.sleep(total_seconds + 2)  # Add buffer
-        except:
-            await asyncio.sleep(180)  # Default 3 minutes
-        
-        # Clean up file
-        try:
-            os.remove(audio_path)
-        except:
-            pass
-        
-        # Play next song
-        await play_next(chat_id)
-        
-    except Exception as e:
-        logger.error(f"Play error: {e}")
-        await status_msg.edit_text(f"❌ Error playing: {queue_item.title}")
-        
-        # Clean up file
-        try:
-            os.remove(audio_path)
-        except:
-            pass
-        
-        # Try next song
-        await play_next(chat_id)
+                status_msg = await bot.send_message(
+                    chat_id,
+                    f"⬇️ Downloading: <b>{html.escape(queue_item.title)}</b>...",
+                    parse_mode=ParseMode.HTML
+                )
+                audio_path = await download_audio(queue_item.url, chat_id)
+
+            if not audio_path:
+                await status_msg.edit_text(
+                    f"❌ Failed to download: {queue_item.title}",
+                    parse_mode=ParseMode.DISABLED
+                )
+                continue
+
+            try:
+                # Join voice chat if not already joined
+                try:
+                    await calls.join_group_call(
+                        chat_id,
+                        AudioPiped(audio_path)
+                    )
+                except:
+                    # If already joined, change stream
+                    await calls.change_stream(
+                        chat_id,
+                        AudioPiped(audio_path)
+                    )
+
+                music_bot.songs_played += 1
+
+                # Prefetch the next song while this one plays
+                if state.queue:
+                    asyncio.create_task(music_bot._prefetch(chat_id))
+
+                # Update status message
+                await status_msg.edit_text(
+                    NOW_PLAYING_TEMPLATE.format(
+                        title=html.escape(queue_item.title),
+                        duration=queue_item.duration,
+                        requested_by=queue_item.requested_by,
+                        queue_size=len(state.queue)
+                    ),
+                    parse_mode=ParseMode.HTML
+                )
+
+                # Wait for StreamAudioEnded (or /skip); the timeout is only a
+                # safety net in case the event never arrives
+                event.clear()
+                try:
+                    await asyncio.wait_for(
+                        event.wait(),
+                        timeout=_parse_duration(queue_item.duration) + 30
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"No stream-end event for chat {chat_id}, advancing")
+
+            except Exception as e:
+                logger.error(f"Play error: {e}")
+                await status_msg.edit_text(
+                    f"❌ Error playing: {queue_item.title}",
+                    parse_mode=ParseMode.DISABLED
+                )
+
+            # No per-song cleanup: DISK_CACHE owns the file lifecycle
+    finally:
+        state.is_playing = False
+        state.now_playing = None
 
 # ============================================================================
 # CALLBACK QUERY HANDLER
@@ -838,101 +1270,182 @@ async def callback_handler(client: Client, callback_query):
 # EVENT HANDLERS
 # ============================================================================
 
+@bot.on_chat_member_updated()
+async def chat_member_updated_handler(client: Client, update: ChatMemberUpdated):
+    """Invalidate cached admin status when a member's rights change"""
+    user = update.new_chat_member.user if update.new_chat_member else None
+    if user:
+        ADMIN_CACHE.pop((update.chat.id, user.id), None)
+
 @calls.on_stream_end()
 async def stream_end_handler(_, update: Update):
     """Handle stream end event"""
     if isinstance(update, StreamAudioEnded):
-        chat_id = update.chat_id
-        await play_next(chat_id)
+        state = music_bot.chats.get(update.chat_id)
+        if state:
+            state.next_event.set()
 
 # ============================================================================
 # STARTUP AND SHUTDOWN
 # ============================================================================
 
+def _ensure_dirs():
+    """Create working directories, skipping makedirs when already present"""
+    for path in ("temp", "data"):
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+
+def _temp_is_empty() -> bool:
+    """True when temp/ exists and holds no entries, so purges can be skipped"""
+    try:
+        with os.scandir("temp") as it:
+            return next(it, None) is None
+    except OSError:
+        return False
+
+def _purge_temp():
+    """Blocking temp-directory reset, meant to run in a worker thread"""
+    if _temp_is_empty():
+        return
+    shutil.rmtree("temp", ignore_errors=True)
+    os.makedirs("temp", exist_ok=True)
+
+async def _purge_temp_subprocess():
+    """Reset temp/ via rm -rf, letting the kernel bulk-delete the inodes"""
+    if _temp_is_empty():
+        return
+    if os.name == "posix":
+        proc = await asyncio.create_subprocess_exec("/bin/rm", "-rf", "temp")
+        await proc.wait()
+        os.makedirs("temp", exist_ok=True)
+    else:
+        await asyncio.to_thread(_purge_temp)
+
 async def startup():
     """Bot startup tasks"""
+    global HTTP_SESSION
+
     logger.info("Starting Music Bot...")
-    
-    # Create necessary directories
-    os.makedirs("temp", exist_ok=True)
-    os.makedirs("data", exist_ok=True)
-    
-    # Clean temp directory
-    for file in os.listdir("temp"):
-        try:
-            os.remove(f"temp/{file}")
-        except:
-            pass
-    
+
+    # Shared HTTP session so searches reuse pooled connections
+    HTTP_SESSION = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=100,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+    )
+
+    # Load saved queues
+    await music_bot.load_data()
+
+    # Background deletion of evicted cache files
+    asyncio.create_task(_cleaner())
+
+    # Ensure working directories, then rebuild the download cache from
+    # whatever a crash left in temp/ (clean shutdowns purge it), both off
+    # the event loop. The seeder must not race the dir creation
+    await asyncio.to_thread(_ensure_dirs)
+    await asyncio.to_thread(_seed_disk_cache)
+
     logger.info("Bot started successfully!")
 
 async def shutdown():
     """Bot shutdown tasks"""
     logger.info("Shutting down Music Bot...")
     
-    # Save data
-    music_bot.save_data()
-    
-    # Clean temp directory
-    for file in os.listdir("temp"):
-        try:
-            os.remove(f"temp/{file}")
-        except:
-            pass
-    
+    # Flush state and reset temp concurrently; neither depends on the other
+    await asyncio.gather(
+        music_bot.save_data(),
+        _purge_temp_subprocess()
+    )
+
+    # Close shared HTTP session
+    if HTTP_SESSION:
+        await HTTP_SESSION.close()
+
     logger.info("Bot shutdown complete!")
 
 # ============================================================================
 # MAIN FUNCTION
 # ============================================================================
 
+# Command menu built once at import; the shape never changes at runtime,
+# so the BotCommand objects are constructed here instead of per startup
+_BOT_COMMANDS: Tuple[Tuple[str, str], ...] = (
+    ("start", "Start the bot"),
+    ("play", "Play music from YouTube"),
+    ("pause", "Pause current song"),
+    ("resume", "Resume paused song"),
+    ("skip", "Skip current song"),
+    ("stop", "Stop playback"),
+    ("end", "End playback and clear queue"),
+    ("clear", "Clear queue"),
+    ("ping", "Check bot latency"),
+    ("reboot", "Reboot bot (Owner only)"),
+    ("broadcast", "Broadcast message (Owner only)"),
+    ("mute", "Mute a user"),
+    ("unmute", "Unmute a user"),
+    ("ban", "Ban a user"),
+    ("unban", "Unban a user"),
+    ("kick", "Kick a user"),
+    ("stats", "Show bot statistics"),
+)
+
+_BOT_COMMAND_OBJS = [BotCommand(cmd, desc) for cmd, desc in _BOT_COMMANDS]
+
 async def main():
     """Main function to run the bot"""
+    # Cap the default to_thread/run_in_executor pool so file I/O helpers
+    # don't spawn the stdlib's cpu_count-based flood of threads. Downloads
+    # keep their own dedicated pool
+    asyncio.get_running_loop().set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(
+            max_workers=4,
+            thread_name_prefix="bot-io"
+        )
+    )
+
     # Startup tasks
     await startup()
     
     try:
-        # Start Pyrogram client
-        await bot.start()
-        logger.info("Pyrogram client started")
-        
-        # Start PyTgCalls client
-        await calls.start()
-        logger.info("PyTgCalls client started")
-        
+        # Both starts are network handshakes with no dependency on each
+        # other, so run them concurrently
+        async def _start_bot():
+            await bot.start()
+            logger.info("Pyrogram client started")
+
+        async def _start_calls():
+            await calls.start()
+            logger.info("PyTgCalls client started")
+
+        await asyncio.gather(_start_bot(), _start_calls())
+
         # Set bot commands
-        await bot.set_bot_commands([
-            ("start", "Start the bot"),
-            ("play", "Play music from YouTube"),
-            ("pause", "Pause current song"),
-            ("resume", "Resume paused song"),
-            ("skip", "Skip current song"),
-            ("stop", "Stop playback"),
-            ("end", "End playback and clear queue"),
-            ("clear", "Clear queue"),
-            ("ping", "Check bot latency"),
-            ("reboot", "Reboot bot (Owner only)"),
-            ("broadcast", "Broadcast message (Owner only)"),
-            ("mute", "Mute a user"),
-            ("unmute", "Unmute a user"),
-            ("ban", "Ban a user"),
-            ("unban", "Unban a user"),
-            ("kick", "Kick a user"),
-            ("stats", "Show bot statistics"),
-        ])
-        
+        await bot.set_bot_commands(_BOT_COMMAND_OBJS)
+
         logger.info("Bot commands set")
         logger.info("Bot is now running...")
-        
-        # Keep the bot running
-        await idle()
-        
+
+        # Block on a signal-driven event instead of idle()'s polling loop
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await stop.wait()
+
     except Exception as e:
         logger.error(f"Error: {e}")
     finally:
-        # Shutdown tasks
-        await shutdown()
-        await bot.stop()
+        # Filesystem cleanup and the network stop handshakes are
+        # independent; run them together and surface every failure
+        await asyncio.gather(
+            shutdown(),
+            bot.stop(),
+            calls.stop() if hasattr(calls, "stop") else asyncio.sleep(0),
+            return_exceptions=True
+        )
 
 if __name__ == "__main__":
     # Run the bot